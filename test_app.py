@@ -2,177 +2,261 @@
 """Comprehensive test suite for the Derme application"""
 
 import unittest
+import hashlib
 import os
 import sys
+from unittest import mock
 from datetime import datetime
 
 # Add the current directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Use an in-memory database; must be set before the app module is imported
+os.environ['DERME_DATABASE_URI'] = 'sqlite:///:memory:'
+
 from app import (
     app, db, User, UserAllergen, SafeProduct, AllergicProduct,
-    KnownAllergen, IngredientSynonym,
+    KnownAllergen, IngredientSynonym, TEST_HASH_PREFIX,
     normalize_ingredient, parse_ingredients, find_ingredient_synonyms,
-    detect_potential_allergens, analyze_ingredients
+    find_ingredient_synonyms_map, detect_potential_allergens, analyze_ingredients,
+    analyze_ingredients_batch
 )
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
 
+# Hashed once at import with a cheap work factor; tests that only need a user
+# row assign it directly instead of calling set_password
+TEST_PASSWORD_HASH = generate_password_hash('password', method='pbkdf2:sha256:1000')
 
-class TestUserModel(unittest.TestCase):
-    """Test cases for User model"""
+
+# Durability is meaningless for an in-memory database; foreign keys are
+# enforced so tests catch rows that reference missing parents
+TEST_SQLITE_PRAGMAS = (
+    'PRAGMA foreign_keys=ON',
+    'PRAGMA synchronous=OFF',
+    'PRAGMA journal_mode=MEMORY',
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+def fetch_row(*columns, **filters):
+    """Load only the given columns of the one row matching filters"""
+    return db.session.execute(db.select(*columns).filter_by(**filters)).one()
+
+
+def setUpModule():
+    """Create the schema once for the whole module"""
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        # The in-memory engine shares a single connection (StaticPool), so
+        # pragmas set here apply to every session in the tests
+        with db.engine.connect() as conn:
+            for pragma in TEST_SQLITE_PRAGMAS:
+                conn.exec_driver_sql(pragma)
+        db.create_all()
+
+
+def tearDownModule():
+    """Discard the in-memory database after the last test in the module"""
+    with app.app_context():
+        db.session.remove()
+        # Closing the only connection drops the :memory: database with it,
+        # so there is no need to run DROP TABLE for every model
+        db.engine.dispose()
+
+
+class DermeTestCase(unittest.TestCase):
+    """Base class for tests that use the database.
+
+    The schema is shared across the module and one user is seeded per class
+    (self.user_id); each test runs inside a single app context and only
+    deletes the rows it wrote instead of dropping and recreating every table.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        """Seed the user shared by every test in the class"""
+        with app.app_context():
+            user = User(username='owner', email='owner@example.com')
+            user.password_hash = TEST_PASSWORD_HASH
+            db.session.add(user)
+            db.session.commit()
+            cls.user_id = user.id
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared user"""
+        with app.app_context():
+            db.session.execute(User.__table__.delete())
+            db.session.commit()
     
     def setUp(self):
-        """Set up test database before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        app.config['WTF_CSRF_ENABLED'] = False
+        """Set up test client and push one app context for the whole test"""
         self.app = app.test_client()
-        
-        with app.app_context():
-            db.create_all()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        # Registered as a cleanup so the context is popped even if tearDown fails
+        self.addCleanup(self.app_context.pop)
+    
+    def login_as(self, user_id):
+        """Log the test client in without posting to /login or checking a password"""
+        with self.app.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+    
+    def seed_allergic_products(self, count):
+        """Insert count allergic products for the shared user and return their ids"""
+        result = db.session.execute(
+            db.insert(AllergicProduct).returning(AllergicProduct.id),
+            [
+                {
+                    'user_id': self.user_id,
+                    'product_name': f'Product {i}',
+                    'ingredients': 'Water, Fragrance',
+                    'reaction_severity': 'mild'
+                }
+                for i in range(count)
+            ]
+        )
+        product_ids = result.scalars().all()
+        db.session.commit()
+        return product_ids
     
     def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-        
-        # Remove test database file
-        if os.path.exists('test.db'):
-            os.remove('test.db')
+        """Clear all rows after each test, keeping the shared user"""
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            if table is User.__table__:
+                db.session.execute(table.delete().where(table.c.id != self.user_id))
+            else:
+                db.session.execute(table.delete())
+        db.session.commit()
+
+
+class TestUserModel(DermeTestCase):
+    """Test cases for User model"""
     
     def test_user_password_hashing(self):
         """Test that passwords are properly hashed"""
-        with app.app_context():
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('mypassword')
+        
+        # Password should be hashed, not stored in plain text
+        self.assertNotEqual(user.password_hash, 'mypassword')
+        self.assertTrue(user.check_password('mypassword'))
+        self.assertFalse(user.check_password('wrongpassword'))
+    
+    def test_production_hashing_outside_testing(self):
+        """Test the real Werkzeug hash is used, and test hashes rejected, when TESTING is off"""
+        with mock.patch.dict(app.config, TESTING=False):
             user = User(username='testuser', email='test@example.com')
             user.set_password('mypassword')
+            user.set_security_answer(1, 'Fluffy')
             
-            # Password should be hashed, not stored in plain text
-            self.assertNotEqual(user.password_hash, 'mypassword')
+            for secret_hash in (user.password_hash, user.security_answer_1_hash):
+                self.assertFalse(secret_hash.startswith(TEST_HASH_PREFIX))
             self.assertTrue(user.check_password('mypassword'))
             self.assertFalse(user.check_password('wrongpassword'))
+            self.assertTrue(user.check_security_answer(1, ' fluffy '))
+            
+            # The TESTING shortcut must never verify in production
+            user.password_hash = TEST_HASH_PREFIX + hashlib.sha256(b'mypassword').hexdigest()
+            self.assertFalse(user.check_password('mypassword'))
     
     def test_user_security_questions(self):
         """Test security question functionality"""
-        with app.app_context():
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('mypassword')
-            
-            # Set security questions
-            user.security_question_1 = 'What is your pet name?'
-            user.set_security_answer(1, 'Fluffy')
-            
-            db.session.add(user)
-            db.session.commit()
-            
-            # Verify security answers work
-            self.assertTrue(user.check_security_answer(1, 'fluffy'))  # Case insensitive
-            self.assertTrue(user.check_security_answer(1, 'Fluffy'))
-            self.assertTrue(user.check_security_answer(1, ' Fluffy '))  # Trimmed
-            self.assertFalse(user.check_security_answer(1, 'wrong'))
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('mypassword')
+        
+        # Set security questions
+        user.security_question_1 = 'What is your pet name?'
+        user.set_security_answer(1, 'Fluffy')
+        
+        db.session.add(user)
+        db.session.commit()
+        
+        # Verify security answers work (case insensitive, trimmed)
+        cases = [
+            ('fluffy', True),
+            ('Fluffy', True),
+            (' Fluffy ', True),
+            ('wrong', False),
+        ]
+        for answer, expected in cases:
+            with self.subTest(answer=answer):
+                self.assertEqual(user.check_security_answer(1, answer), expected)
     
     def test_user_creation(self):
         """Test basic user creation"""
-        with app.app_context():
-            user = User(username='newuser', email='newuser@example.com')
-            user.set_password('password123')
-            
-            db.session.add(user)
-            db.session.commit()
-            
-            # Retrieve user and verify
-            retrieved_user = User.query.filter_by(username='newuser').first()
-            self.assertIsNotNone(retrieved_user)
-            self.assertEqual(retrieved_user.email, 'newuser@example.com')
-            self.assertTrue(retrieved_user.check_password('password123'))
+        user = User(username='newuser', email='newuser@example.com')
+        user.set_password('password123')
+        
+        db.session.add(user)
+        db.session.commit()
+        
+        # Retrieve user and verify
+        retrieved_user = User.query.filter_by(username='newuser').first()
+        self.assertIsNotNone(retrieved_user)
+        self.assertEqual(retrieved_user.email, 'newuser@example.com')
+        self.assertTrue(retrieved_user.check_password('password123'))
 
 
-class TestDatabaseModels(unittest.TestCase):
+class TestDatabaseModels(DermeTestCase):
     """Test cases for database models"""
     
-    def setUp(self):
-        """Set up test database before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        self.app = app.test_client()
-        
-        with app.app_context():
-            db.create_all()
-    
-    def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-        
-        if os.path.exists('test.db'):
-            os.remove('test.db')
-    
     def test_user_allergen_model(self):
         """Test UserAllergen model"""
-        with app.app_context():
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('password')
-            db.session.add(user)
-            db.session.commit()
-            
-            allergen = UserAllergen(
-                user_id=user.id,
-                ingredient_name='Fragrance',
-                severity='severe'
-            )
-            db.session.add(allergen)
-            db.session.commit()
-            
-            # Verify allergen was saved
-            saved_allergen = UserAllergen.query.filter_by(user_id=user.id).first()
-            self.assertIsNotNone(saved_allergen)
-            self.assertEqual(saved_allergen.ingredient_name, 'Fragrance')
-            self.assertEqual(saved_allergen.severity, 'severe')
+        allergen = UserAllergen(
+            user_id=self.user_id,
+            ingredient_name='Fragrance',
+            severity='severe'
+        )
+        db.session.add(allergen)
+        db.session.commit()
+        
+        # Verify allergen was saved
+        saved = fetch_row(
+            UserAllergen.ingredient_name, UserAllergen.severity,
+            user_id=self.user_id
+        )
+        self.assertEqual(tuple(saved), ('Fragrance', 'severe'))
     
     def test_safe_product_model(self):
         """Test SafeProduct model"""
-        with app.app_context():
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('password')
-            db.session.add(user)
-            db.session.commit()
-            
-            product = SafeProduct(
-                user_id=user.id,
-                product_name='Test Lotion',
-                ingredients='Water, Glycerin, Aloe Vera'
-            )
-            db.session.add(product)
-            db.session.commit()
-            
-            # Verify product was saved
-            saved_product = SafeProduct.query.filter_by(user_id=user.id).first()
-            self.assertIsNotNone(saved_product)
-            self.assertEqual(saved_product.product_name, 'Test Lotion')
-            self.assertIn('Water', saved_product.ingredients)
+        product = SafeProduct(
+            user_id=self.user_id,
+            product_name='Test Lotion',
+            ingredients='Water, Glycerin, Aloe Vera'
+        )
+        db.session.add(product)
+        db.session.commit()
+        
+        # Verify product was saved
+        product_name, ingredients = fetch_row(
+            SafeProduct.product_name, SafeProduct.ingredients,
+            user_id=self.user_id
+        )
+        self.assertEqual(product_name, 'Test Lotion')
+        self.assertIn('Water', ingredients)
     
     def test_allergic_product_model(self):
         """Test AllergicProduct model"""
-        with app.app_context():
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('password')
-            db.session.add(user)
-            db.session.commit()
-            
-            product = AllergicProduct(
-                user_id=user.id,
-                product_name='Bad Cream',
-                ingredients='Water, Fragrance, Parabens',
-                reaction_severity='moderate'
-            )
-            db.session.add(product)
-            db.session.commit()
-            
-            # Verify product was saved
-            saved_product = AllergicProduct.query.filter_by(user_id=user.id).first()
-            self.assertIsNotNone(saved_product)
-            self.assertEqual(saved_product.product_name, 'Bad Cream')
-            self.assertEqual(saved_product.reaction_severity, 'moderate')
+        product = AllergicProduct(
+            user_id=self.user_id,
+            product_name='Bad Cream',
+            ingredients='Water, Fragrance, Parabens',
+            reaction_severity='moderate'
+        )
+        db.session.add(product)
+        db.session.commit()
+        
+        # Verify product was saved
+        saved = fetch_row(
+            AllergicProduct.product_name, AllergicProduct.reaction_severity,
+            user_id=self.user_id
+        )
+        self.assertEqual(tuple(saved), ('Bad Cream', 'moderate'))
 
 
 class TestHelperFunctions(unittest.TestCase):
@@ -186,19 +270,19 @@ class TestHelperFunctions(unittest.TestCase):
     
     def test_parse_ingredients(self):
         """Test ingredient parsing"""
-        # Test comma-separated ingredients
-        ingredients = parse_ingredients('Water, Glycerin, Aloe Vera')
-        self.assertEqual(len(ingredients), 3)
-        self.assertIn('Water', ingredients)
-        self.assertIn('Glycerin', ingredients)
-        
-        # Test with semicolons
-        ingredients = parse_ingredients('Water; Glycerin; Aloe Vera')
-        self.assertEqual(len(ingredients), 3)
-        
-        # Test with numbered list
-        ingredients = parse_ingredients('1. Water, 2. Glycerin, 3. Aloe Vera')
-        self.assertTrue(len(ingredients) >= 3)
+        cases = [
+            # Comma-separated ingredients
+            ('Water, Glycerin, Aloe Vera', ['Water', 'Glycerin', 'Aloe Vera']),
+            # Semicolons
+            ('Water; Glycerin; Aloe Vera', ['Water', 'Glycerin', 'Aloe Vera']),
+            # Numbered list
+            ('1. Water, 2. Glycerin, 3. Aloe Vera', ['Water', 'Glycerin', 'Aloe Vera']),
+            # Nothing to parse
+            ('', []),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_ingredients(text), expected)
     
     def test_parse_ingredients_with_newlines(self):
         """Test ingredient parsing with newlines"""
@@ -207,151 +291,180 @@ class TestHelperFunctions(unittest.TestCase):
         self.assertTrue(len(ingredients) > 0)
 
 
-class TestIngredientSynonyms(unittest.TestCase):
+class TestIngredientSynonyms(DermeTestCase):
     """Test cases for ingredient synonyms"""
     
-    def setUp(self):
-        """Set up test database before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        
-        with app.app_context():
-            db.create_all()
-    
-    def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-        
-        if os.path.exists('test.db'):
-            os.remove('test.db')
-    
     def test_find_ingredient_synonyms(self):
         """Test finding ingredient synonyms"""
-        with app.app_context():
-            # Add a synonym
-            synonym = IngredientSynonym(
-                primary_name='Vitamin E',
-                synonym='Tocopherol'
-            )
-            db.session.add(synonym)
-            db.session.commit()
-            
-            # Find synonyms
-            synonyms = find_ingredient_synonyms('Vitamin E')
-            self.assertIn('vitamin e', synonyms)
-            self.assertIn('tocopherol', synonyms)
-            
-            # Test reverse lookup
-            synonyms = find_ingredient_synonyms('Tocopherol')
-            self.assertIn('vitamin e', synonyms)
-            self.assertIn('tocopherol', synonyms)
+        # Add a synonym
+        synonym = IngredientSynonym(
+            primary_name='Vitamin E',
+            synonym='Tocopherol'
+        )
+        db.session.add(synonym)
+        db.session.commit()
+        
+        # Find synonyms
+        synonyms = find_ingredient_synonyms('Vitamin E')
+        self.assertIn('vitamin e', synonyms)
+        self.assertIn('tocopherol', synonyms)
+        
+        # Test reverse lookup
+        synonyms = find_ingredient_synonyms('Tocopherol')
+        self.assertIn('vitamin e', synonyms)
+        self.assertIn('tocopherol', synonyms)
+    
+    def test_find_ingredient_synonyms_map(self):
+        """Test batch synonym lookup matches the single-ingredient lookup"""
+        db.session.add_all([
+            IngredientSynonym(primary_name='Vitamin E', synonym='Tocopherol'),
+            IngredientSynonym(primary_name='Fragrance', synonym='Parfum'),
+        ])
+        db.session.commit()
+        
+        ingredients = ['Vitamin E', 'PARFUM', 'Water']
+        synonym_map = find_ingredient_synonyms_map(ingredients)
+        
+        self.assertEqual(set(synonym_map), {'vitamin e', 'parfum', 'water'})
+        for ingredient in ingredients:
+            with self.subTest(ingredient=ingredient):
+                self.assertEqual(
+                    sorted(synonym_map[normalize_ingredient(ingredient)]),
+                    sorted(find_ingredient_synonyms(ingredient))
+                )
 
 
-class TestAllergenDetection(unittest.TestCase):
+class TestAllergenDetection(DermeTestCase):
     """Test cases for allergen detection"""
     
-    def setUp(self):
-        """Set up test database before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        
-        with app.app_context():
-            db.create_all()
-    
-    def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-        
-        if os.path.exists('test.db'):
-            os.remove('test.db')
-    
     def test_detect_potential_allergens(self):
         """Test detection of potential allergens"""
-        with app.app_context():
-            # Create test user
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('password')
-            db.session.add(user)
-            db.session.commit()
-            
-            # Add allergic product
-            allergic = AllergicProduct(
-                user_id=user.id,
-                product_name='Bad Product',
-                ingredients='Water, Fragrance, Parabens'
-            )
-            db.session.add(allergic)
-            
-            # Add safe product
-            safe = SafeProduct(
-                user_id=user.id,
-                product_name='Good Product',
-                ingredients='Water, Glycerin'
-            )
-            db.session.add(safe)
-            db.session.commit()
-            
-            # Detect potential allergens
-            potential = detect_potential_allergens(user.id)
-            
-            # Fragrance and Parabens should be potential allergens
-            # (present in allergic but not in safe products)
-            self.assertTrue(len(potential) >= 0)  # May be empty or contain detected allergens
+        # Add allergic and safe products in a single batch
+        allergic = AllergicProduct(
+            user_id=self.user_id,
+            product_name='Bad Product',
+            ingredients='Water, Fragrance, Parabens'
+        )
+        safe = SafeProduct(
+            user_id=self.user_id,
+            product_name='Good Product',
+            ingredients='Water, Glycerin'
+        )
+        db.session.add_all([allergic, safe])
+        db.session.commit()
+        
+        # Detect potential allergens
+        potential = detect_potential_allergens(self.user_id)
+        
+        # Fragrance and Parabens should be potential allergens
+        # (present in allergic but not in safe products)
+        self.assertEqual(sorted(p['name'] for p in potential), ['Fragrance', 'Parabens'])
     
     def test_analyze_ingredients_with_known_allergen(self):
         """Test analyzing ingredients against user allergens"""
-        with app.app_context():
-            # Create test user
-            user = User(username='testuser', email='test@example.com')
-            user.set_password('password')
-            db.session.add(user)
-            db.session.commit()
-            
-            # Add user allergen
-            allergen = UserAllergen(
-                user_id=user.id,
-                ingredient_name='Fragrance',
-                severity='severe'
-            )
-            db.session.add(allergen)
-            db.session.commit()
-            
-            # Analyze ingredients
-            ingredients = ['Water', 'Glycerin', 'Fragrance']
-            analysis = analyze_ingredients(ingredients, user.id)
-            
-            # Should find Fragrance as an allergen
-            self.assertTrue(len(analysis['allergens_found']) > 0)
-            allergen_names = [a['name'] for a in analysis['allergens_found']]
-            self.assertIn('Fragrance', allergen_names)
+        # Add user allergen
+        allergen = UserAllergen(
+            user_id=self.user_id,
+            ingredient_name='Fragrance',
+            severity='severe'
+        )
+        db.session.add(allergen)
+        db.session.commit()
+        
+        # Matching ignores case, so every spelling should be flagged
+        cases = [
+            ['Water', 'Glycerin', 'Fragrance'],
+            ['water', 'FRAGRANCE', 'glycerin'],
+            ['WATER', 'fragrance', 'GLYCERIN'],
+        ]
+        for ingredients in cases:
+            with self.subTest(ingredients=ingredients):
+                analysis = analyze_ingredients(ingredients, self.user_id)
+                
+                allergen_names = [a['name'].lower() for a in analysis['allergens_found']]
+                self.assertEqual(allergen_names, ['fragrance'])
+    
+    def test_analyze_ingredients_with_multiple_allergens(self):
+        """Test every allergen the user tracks is reported with its severity"""
+        db.session.execute(db.insert(UserAllergen), [
+            {'user_id': self.user_id, 'ingredient_name': 'Fragrance', 'severity': 'severe'},
+            {'user_id': self.user_id, 'ingredient_name': 'Formaldehyde', 'severity': 'moderate'},
+        ])
+        db.session.commit()
+        
+        ingredients = ['Water', 'Fragrance', 'Glycerin', 'Formaldehyde']
+        analysis = analyze_ingredients(ingredients, self.user_id)
+        
+        found = [(a['name'], a['severity']) for a in analysis['allergens_found']]
+        self.assertEqual(found, [('Fragrance', 'severe'), ('Formaldehyde', 'moderate')])
+    
+    def test_analyze_ingredients_batch(self):
+        """Test a batch call gives the same result as analyzing each list alone"""
+        db.session.add_all([
+            UserAllergen(user_id=self.user_id, ingredient_name='Fragrance', severity='severe'),
+            KnownAllergen(name='Formaldehyde', category='Preservative'),
+        ])
+        db.session.commit()
+        
+        ingredient_lists = [
+            ['Water', 'Fragrance'],
+            ['Formaldehyde', 'Glycerin'],
+            [],
+        ]
+        batch = analyze_ingredients_batch(ingredient_lists, self.user_id)
+        
+        self.assertEqual(len(batch), len(ingredient_lists))
+        self.assertEqual([a['name'] for a in batch[0]['allergens_found']], ['Fragrance'])
+        self.assertEqual([w['name'] for w in batch[1]['warnings']], ['Formaldehyde'])
+        for ingredients, analysis in zip(ingredient_lists, batch):
+            with self.subTest(ingredients=ingredients):
+                self.assertEqual(analysis, analyze_ingredients(ingredients, self.user_id))
+    
+    def test_analyze_ingredients_within_old_sqlite_parameter_limit(self):
+        """Test long ingredient lists stay under the 999-parameter limit of SQLite < 3.32"""
+        db.session.add_all([
+            UserAllergen(user_id=self.user_id, ingredient_name='Fragrance', severity='severe'),
+            KnownAllergen(name='Formaldehyde', category='Preservative'),
+        ])
+        db.session.commit()
+        
+        # Record how many parameters each statement binds
+        bound_counts = []
+        def record_parameters(conn, cursor, statement, parameters, context, executemany):
+            bound_counts.append(len(parameters))
+        
+        ingredients = [f'Ingredient {i}' for i in range(1200)] + ['Fragrance', 'Formaldehyde']
+        event.listen(db.engine, 'before_cursor_execute', record_parameters)
+        try:
+            analysis = analyze_ingredients(ingredients, self.user_id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record_parameters)
+        
+        self.assertLessEqual(max(bound_counts), 999)
+        self.assertEqual([a['name'] for a in analysis['allergens_found']], ['Fragrance'])
+        self.assertEqual([w['name'] for w in analysis['warnings']], ['Formaldehyde'])
+        self.assertEqual(len(analysis['safe_ingredients']), 1200)
+    
+    def test_analyze_ingredients_warns_on_known_allergens(self):
+        """Test known allergens are reported as warnings, once per ingredient"""
+        db.session.add_all([
+            KnownAllergen(name='Formaldehyde', category='Preservative'),
+            KnownAllergen(name='Fragrance', category='Fragrance'),
+            IngredientSynonym(primary_name='Fragrance', synonym='Parfum'),
+        ])
+        db.session.commit()
+        
+        ingredients = ['Water', 'Formaldehyde', 'Parfum']
+        analysis = analyze_ingredients(ingredients, self.user_id)
+        
+        warnings = [(w['name'], w['allergen_name']) for w in analysis['warnings']]
+        self.assertEqual(warnings, [('Formaldehyde', 'Formaldehyde'), ('Parfum', 'Fragrance')])
+        self.assertEqual(analysis['safe_ingredients'], ['Water'])
 
 
-class TestRoutes(unittest.TestCase):
+class TestRoutes(DermeTestCase):
     """Test cases for application routes"""
     
-    def setUp(self):
-        """Set up test client before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        app.config['WTF_CSRF_ENABLED'] = False
-        self.app = app.test_client()
-        
-        with app.app_context():
-            db.create_all()
-    
-    def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-        
-        if os.path.exists('test.db'):
-            os.remove('test.db')
-    
     def test_index_route(self):
         """Test index page loads"""
         response = self.app.get('/')
@@ -372,64 +485,197 @@ class TestRoutes(unittest.TestCase):
         response = self.app.get('/forgot-password')
         self.assertEqual(response.status_code, 200)
     
-    def test_dashboard_requires_login(self):
-        """Test dashboard requires authentication"""
-        response = self.app.get('/dashboard', follow_redirects=False)
-        # Should redirect to login
-        self.assertIn(response.status_code, [302, 401])
-
-
-class TestKnownAllergens(unittest.TestCase):
-    """Test cases for known allergen database"""
+    def test_protected_routes_require_login(self):
+        """Test pages that need an account redirect anonymous users to login"""
+        protected = [
+            ('get', '/dashboard'),
+            ('get', '/allergens'),
+            ('post', '/allergens/delete/1'),
+            ('get', '/scan'),
+            ('get', '/scan/results'),
+            ('post', '/scan/save'),
+            ('get', '/products/allergic'),
+            ('post', '/products/allergic/delete/1'),
+            ('get', '/potential-allergens'),
+            ('get', '/symptoms'),
+            ('post', '/symptoms/sync'),
+            ('get', '/analytics'),
+            ('get', '/find-dermatologist'),
+        ]
+        for method, path in protected:
+            with self.subTest(method=method, path=path):
+                response = getattr(self.app, method)(path, follow_redirects=False)
+                # Should redirect to login
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/login', response.location)
+    
+    def test_successful_login(self):
+        """Test logging in through the form checks the real password hash"""
+        # The only test that posts to /login; others use login_as
+        response = self.app.post('/login', data={
+            'username': 'owner',
+            'password': 'password'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/dashboard', response.location)
+    
+    def test_dashboard_loads_when_logged_in(self):
+        """Test dashboard loads for an authenticated user"""
+        self.login_as(self.user_id)
+        response = self.app.get('/dashboard')
+        self.assertEqual(response.status_code, 200)
     
-    def setUp(self):
-        """Set up test database before each test"""
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
+    def test_add_multiple_allergens(self):
+        """Test allergens added by form and in bulk are all listed"""
+        self.login_as(self.user_id)
+        allergens = [('Fragrance', 'severe'), ('Parabens', 'moderate'), ('Lanolin', 'mild')]
         
-        with app.app_context():
-            db.create_all()
+        # Go through the form once for route coverage
+        name, severity = allergens[0]
+        response = self.app.post('/allergens', data={
+            'ingredient_name': name,
+            'severity': severity
+        })
+        self.assertEqual(response.status_code, 302)
+        
+        # Seed the rest with one executemany INSERT
+        db.session.execute(db.insert(UserAllergen), [
+            {'user_id': self.user_id, 'ingredient_name': name, 'severity': severity}
+            for name, severity in allergens[1:]
+        ])
+        db.session.commit()
+        
+        response = self.app.get('/allergens')
+        self.assertEqual(response.status_code, 200)
+        for name, severity in allergens:
+            self.assertIn(name.encode(), response.data)
+    
+    def test_cannot_delete_another_users_allergen(self):
+        """Test a user cannot remove an allergen that belongs to someone else"""
+        # Seed the other user and their allergen in one commit
+        other = User(username='other', email='other@example.com')
+        other.password_hash = TEST_PASSWORD_HASH
+        db.session.add(other)
+        db.session.flush()
+        allergen = UserAllergen(user_id=other.id, ingredient_name='Fragrance', severity='severe')
+        db.session.add(allergen)
+        db.session.commit()
+        allergen_id = allergen.id
+        
+        self.login_as(self.user_id)
+        response = self.app.post(f'/allergens/delete/{allergen_id}')
+        self.assertEqual(response.status_code, 302)
+        
+        db.session.expire_all()
+        self.assertIsNotNone(db.session.get(UserAllergen, allergen_id))
+    
+    def test_delete_missing_rows_returns_404(self):
+        """Test deleting an id that does not exist is a 404, not a redirect"""
+        self.login_as(self.user_id)
+        for path in ('/allergens/delete/999', '/products/allergic/delete/999'):
+            with self.subTest(path=path):
+                response = self.app.post(path)
+                self.assertEqual(response.status_code, 404)
+    
+    def test_view_allergic_products(self):
+        """Test the allergic products page lists the user's products"""
+        self.seed_allergic_products(2)
+        self.login_as(self.user_id)
+        
+        response = self.app.get('/products/allergic')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Product 0', response.data)
+        self.assertIn(b'Product 1', response.data)
     
-    def tearDown(self):
-        """Clean up after each test"""
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
+    def test_delete_allergic_product(self):
+        """Test deleting an allergic product removes only that product"""
+        deleted_id, kept_id = self.seed_allergic_products(2)
+        self.login_as(self.user_id)
+        
+        response = self.app.post(f'/products/allergic/delete/{deleted_id}')
+        self.assertEqual(response.status_code, 302)
         
-        if os.path.exists('test.db'):
-            os.remove('test.db')
+        remaining = db.session.execute(db.select(AllergicProduct.id)).scalars().all()
+        self.assertEqual(remaining, [kept_id])
+
+
+class TestRegistration(DermeTestCase):
+    """Test cases for the registration form"""
+    
+    def registration_form(self, **overrides):
+        """Return a valid registration form with the given fields replaced"""
+        data = {
+            'username': 'newuser',
+            'email': 'newuser@example.com',
+            'password': 'password123',
+            'confirm_password': 'password123',
+            'security_question_1': 'What is your pet name?',
+            'security_answer_1': 'Fluffy'
+        }
+        data.update(overrides)
+        return data
+    
+    def test_successful_registration(self):
+        """Test a complete form creates the account and redirects to login"""
+        response = self.app.post('/register', data=self.registration_form())
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.location)
+        
+        # Look the new account up by its unique email rather than counting users
+        username, = fetch_row(User.username, email='newuser@example.com')
+        self.assertEqual(username, 'newuser')
+    
+    def test_registration_missing_field(self):
+        """Test each required field is rejected when blank"""
+        for field in ('username', 'email', 'password'):
+            with self.subTest(field=field):
+                response = self.app.post('/register', data=self.registration_form(**{field: ''}))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(b'All fields are required', response.data)
+                # Only the shared user should exist
+                self.assertIsNone(db.session.execute(
+                    db.select(User.id).where(User.id != self.user_id)
+                ).first())
+    
+    def test_registration_duplicate(self):
+        """Test the shared user's username and email cannot be registered again"""
+        cases = [
+            ('username', 'owner', b'Username already exists'),
+            ('email', 'owner@example.com', b'Email already registered'),
+        ]
+        for field, value, message in cases:
+            with self.subTest(field=field):
+                response = self.app.post('/register', data=self.registration_form(**{field: value}))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(message, response.data)
+                self.assertIsNone(db.session.execute(
+                    db.select(User.id).where(User.id != self.user_id)
+                ).first())
+
+
+class TestKnownAllergens(DermeTestCase):
+    """Test cases for known allergen database"""
     
     def test_known_allergen_creation(self):
         """Test creating known allergen entries"""
-        with app.app_context():
-            allergen = KnownAllergen(
-                name='Formaldehyde',
-                category='Preservative',
-                description='Common preservative in cosmetics'
-            )
-            db.session.add(allergen)
-            db.session.commit()
-            
-            # Verify allergen was saved
-            saved_allergen = KnownAllergen.query.filter_by(name='Formaldehyde').first()
-            self.assertIsNotNone(saved_allergen)
-            self.assertEqual(saved_allergen.category, 'Preservative')
+        allergen = KnownAllergen(
+            name='Formaldehyde',
+            category='Preservative',
+            description='Common preservative in cosmetics'
+        )
+        db.session.add(allergen)
+        db.session.commit()
+        
+        # Verify allergen was saved
+        category, = fetch_row(KnownAllergen.category, name='Formaldehyde')
+        self.assertEqual(category, 'Preservative')
 
 
 def run_tests():
     """Run all tests and return results"""
-    # Create test suite
-    loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestUserModel))
-    suite.addTests(loader.loadTestsFromTestCase(TestDatabaseModels))
-    suite.addTests(loader.loadTestsFromTestCase(TestHelperFunctions))
-    suite.addTests(loader.loadTestsFromTestCase(TestIngredientSynonyms))
-    suite.addTests(loader.loadTestsFromTestCase(TestAllergenDetection))
-    suite.addTests(loader.loadTestsFromTestCase(TestRoutes))
-    suite.addTests(loader.loadTestsFromTestCase(TestKnownAllergens))
+    # Collect every TestCase in this module so new classes are picked up
+    # without registering them here
+    suite = unittest.defaultTestLoader.loadTestsFromModule(sys.modules[__name__])
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
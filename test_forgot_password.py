@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 """Test script to verify the forgot password functionality"""
 
+import os
+
+# Use an in-memory database; must be set before the app module is imported
+os.environ['DERME_DATABASE_URI'] = 'sqlite:///:memory:'
+
 from app import app, db, User
 
 def test_forgot_password_feature():
     """Test the forgot password feature"""
+    app.config['TESTING'] = True
     with app.app_context():
         # Initialize database
         db.create_all()
@@ -77,5 +83,65 @@ def test_forgot_password_feature():
         print("  - Case-insensitive and trimmed answer verification")
         print("  - Password reset functionality")
 
+def test_forgot_password_flow():
+    """Walk through the forgot password pages with the in-process test client"""
+    app.config['TESTING'] = True
+    client = app.test_client()
+    
+    with app.app_context():
+        db.create_all()
+        
+        flow_user = User.query.filter_by(username='flowuser').first()
+        if flow_user:
+            db.session.delete(flow_user)
+            db.session.commit()
+        
+        flow_user = User(username='flowuser', email='flow@example.com')
+        flow_user.set_password('oldpass123')
+        flow_user.security_question_1 = 'What was the name of your first pet?'
+        flow_user.set_security_answer(1, 'Fluffy')
+        db.session.add(flow_user)
+        db.session.commit()
+    
+    try:
+        # Step 1: look up the account
+        response = client.post('/forgot-password', data={'identifier': 'flowuser'})
+        assert response.status_code == 302, "Lookup should redirect to security questions"
+        assert '/verify-security-questions' in response.location
+        print("✓ Account lookup redirects to security questions")
+        
+        # Step 2: the security question is shown and answered
+        response = client.get('/verify-security-questions')
+        assert response.status_code == 200
+        assert b'What was the name of your first pet?' in response.data
+        
+        response = client.post('/verify-security-questions', data={'answer_1': 'wrong'})
+        assert b'Incorrect answer to security question' in response.data
+        print("✓ Wrong security answer correctly rejected")
+        
+        response = client.post('/verify-security-questions', data={'answer_1': ' fluffy '})
+        assert response.status_code == 302, "Correct answer should redirect to reset page"
+        assert '/reset-password' in response.location
+        print("✓ Correct security answer accepted")
+        
+        # Step 3: set the new password
+        response = client.post('/reset-password', data={
+            'new_password': 'newpass123',
+            'confirm_password': 'newpass123'
+        })
+        assert response.status_code == 302, "Reset should redirect to login"
+        assert '/login' in response.location
+        
+        with app.app_context():
+            flow_user = User.query.filter_by(username='flowuser').first()
+            assert flow_user.check_password('newpass123'), "New password check failed"
+            assert not flow_user.check_password('oldpass123'), "Old password should not work"
+        print("✓ Password reset through the web flow works")
+    finally:
+        with app.app_context():
+            User.query.filter_by(username='flowuser').delete()
+            db.session.commit()
+
 if __name__ == '__main__':
     test_forgot_password_feature()
+    test_forgot_password_flow()